@@ -14,6 +14,7 @@ import asyncio
 import json
 import os
 import sys
+import time
 from pathlib import Path
 
 # 添加 scripts 目录到路径
@@ -21,11 +22,23 @@ SCRIPT_DIR = Path(__file__).parent / "scripts"
 sys.path.insert(0, str(SCRIPT_DIR))
 
 try:
-    from claude_agent_sdk import query, ClaudeAgentOptions, AssistantMessage, TextBlock
+    from claude_agent_sdk import (
+        query, tool, create_sdk_mcp_server,
+        ClaudeAgentOptions, AssistantMessage, ResultMessage, StreamEvent, TextBlock,
+    )
 except ImportError:
     print("错误: 请安装 claude-agent-sdk: pip install claude-agent-sdk")
     sys.exit(1)
 
+from note_corpus import get_note
+from workflow_state import get_result, mark_done, pending_note_id, start_note
+
+# Agent 模式的轮数上限：5 次工具调用 + 总结，留少量余量
+MAX_AGENT_TURNS = int(os.environ.get("CLAUDE_MAX_TURNS", 8))
+
+# Agent 模式只允许调用流水线工具，不开放 shell 和文件编辑
+DISALLOWED_AGENT_TOOLS = ["Bash", "Read", "Write", "Edit", "Glob", "Grep", "WebFetch", "WebSearch", "Task"]
+
 
 def get_system_prompt() -> str:
     """读取 CLAUDE.md 作为系统提示"""
@@ -57,110 +70,237 @@ def validate_environment() -> bool:
     return True
 
 
-async def run_workflow():
-    """运行完整的笔记生成工作流"""
+def stage_select(note_id: str = None) -> dict:
+    """选择笔记；未指定时优先继续自动选择后未完成的笔记"""
+    auto = not note_id
+    if note_id:
+        if get_note(note_id) is None:
+            raise ValueError(f"找不到笔记 {note_id}")
+    else:
+        note_id = pending_note_id()
+        if note_id and get_note(note_id) is None:
+            note_id = None
+    if not note_id:
+        from select_next_note import select_next_note
+        note_id = select_next_note()
+    if not note_id:
+        raise ValueError("没有可用的笔记")
+    start_note(note_id, auto=auto)
+    mark_done(note_id, "select", {"note_id": note_id})
+    return {"note_id": note_id}
+
+
+def _prompts(note_id: str) -> dict:
+    from generate_prompts import save_prompts
+    prompts, output_file = save_prompts(note_id)
+    return {"count": len(prompts), "file": output_file}
+
+
+def _images(note_id: str) -> dict:
+    from generate_images import generate_note_images
+    success_count, total = generate_note_images(note_id)
+    if success_count == 0:
+        raise RuntimeError(f"0/{total} 张图片生成成功")
+    return {"success": success_count, "total": total}
+
+
+def _upload(note_id: str) -> dict:
+    from upload_to_feishu import upload_note
+    result = upload_note(note_id)
+    return {"code": result.get("code")}
+
+
+def _log(note_id: str) -> dict:
+    from update_log import update_log
+    update_log(note_id)
+    return {"note_id": note_id}
+
+
+# 选择笔记之后的步骤，按执行顺序排列
+PIPELINE_STAGES = [
+    ("prompts", _prompts),
+    ("images", _images),
+    ("upload", _upload),
+    ("log", _log),
+]
+
+
+def run_stage(stage: str, note_id: str) -> tuple:
+    """执行一个步骤并写入断点，已完成的步骤直接返回记录的结果
+
+    返回 (结果, 是否从断点恢复)。
+    """
+    stages = ["select"] + [name for name, _ in PIPELINE_STAGES]
+    previous = stages[stages.index(stage) - 1]
+    if get_result(note_id, previous) is None:
+        raise RuntimeError(f"笔记 {note_id} 需要先完成步骤 {previous}")
+    
+    cached = get_result(note_id, stage)
+    if cached is not None:
+        return cached, True
     
+    result = dict(PIPELINE_STAGES)[stage](note_id)
+    mark_done(note_id, stage, result)
+    return result, False
+
+
+async def run_workflow(note_id: str = None):
+    """运行完整的笔记生成工作流
+
+    各步骤在当前进程内调用，常驻模式下可复用已解析的笔记、HTTP 连接和 token。
+    每个步骤完成后写入断点，中断后再次运行会从未完成的步骤继续。
+    """
     # 1. 选择下一篇笔记
-    print("📋 步骤 1: 选择下一篇笔记...")
-    from select_next_note import select_next_note
-    note_id = select_next_note()
-    if not note_id:
-        print("❌ 没有可用的笔记")
+    print("📋 步骤 1: 选择笔记...")
+    try:
+        note_id = (await asyncio.to_thread(stage_select, note_id))["note_id"]
+    except Exception as e:
+        print(f"❌ {e}")
         return False
     print(f"   ✓ 选中笔记: {note_id}")
     
-    # 2. 生成提示词
-    print(f"📝 步骤 2: 生成图片提示词...")
-    from generate_prompts import generate_prompts
-    import subprocess
-    result = subprocess.run(
-        [sys.executable, str(SCRIPT_DIR / "generate_prompts.py"), "--note_id", note_id],
-        capture_output=True,
-        text=True
-    )
-    if result.returncode != 0:
-        print(f"❌ 生成提示词失败:")
-        print(f"   stdout: {result.stdout}")
-        print(f"   stderr: {result.stderr}")
-        return False
-    print(f"   ✓ {result.stdout.strip()}")
+    steps = {
+        "prompts": ("📝 步骤 2: 生成图片提示词...", "生成提示词失败"),
+        "images": ("🎨 步骤 3: 生成图片...", "生成图片失败"),
+        "upload": ("☁️ 步骤 4: 上传到飞书...", "上传失败"),
+        "log": ("📊 步骤 5: 更新使用日志...", "更新日志失败"),
+    }
+    for stage, _ in PIPELINE_STAGES:
+        title, error_label = steps[stage]
+        print(title)
+        try:
+            result, resumed = await asyncio.to_thread(run_stage, stage, note_id)
+        except Exception as e:
+            print(f"❌ {error_label}: {e}")
+            return False
+        prefix = "已完成，跳过" if resumed else "完成"
+        print(f"   ✓ {prefix}: {json.dumps(result, ensure_ascii=False)}")
     
-    # 3. 生成图片
-    print(f"🎨 步骤 3: 使用 Replicate 生成图片...")
-    result = subprocess.run(
-        [sys.executable, str(SCRIPT_DIR / "generate_images.py"), "--note_id", note_id],
-        capture_output=True,
-        text=True
-    )
-    if result.returncode != 0:
-        print(f"❌ 生成图片失败:")
-        print(f"   stdout: {result.stdout}")
-        print(f"   stderr: {result.stderr}")
-        return False
-    print(f"   ✓ {result.stdout.strip()}")
+    print(f"\n✅ 笔记 {note_id} 生成完成!")
+    return True
+
+
+def _tool_result(data: dict, is_error: bool = False) -> dict:
+    result = {"content": [{"type": "text", "text": json.dumps(data, ensure_ascii=False)}]}
+    if is_error:
+        result["is_error"] = True
+    return result
+
+
+def build_pipeline_server(session: dict):
+    """将流水线步骤注册为进程内 MCP 工具，选中的笔记 ID 记录到 session"""
     
-    # 4. 上传到飞书
-    print(f"☁️ 步骤 4: 上传到飞书...")
-    result = subprocess.run(
-        [sys.executable, str(SCRIPT_DIR / "upload_to_feishu.py"), "--note_id", note_id],
-        capture_output=True,
-        text=True
-    )
-    if result.returncode != 0:
-        print(f"❌ 上传失败:")
-        print(f"   stdout: {result.stdout}")
-        print(f"   stderr: {result.stderr}")
-        return False
-    print(f"   ✓ {result.stdout.strip()}")
+    @tool("select_next_note", "选择下一篇未使用的笔记（有未完成的笔记时继续该笔记），返回 note_id", {})
+    async def select_tool(args):
+        try:
+            result = await asyncio.to_thread(stage_select)
+        except Exception as e:
+            return _tool_result({"error": str(e)}, is_error=True)
+        session["note_id"] = result["note_id"]
+        return _tool_result(result)
     
-    # 5. 更新日志
-    print(f"📊 步骤 5: 更新使用日志...")
-    result = subprocess.run(
-        [sys.executable, str(SCRIPT_DIR / "update_log.py"), "--note_id", note_id],
-        capture_output=True,
-        text=True
-    )
-    if result.returncode != 0:
-        print(f"❌ 更新日志失败:")
-        print(f"   stdout: {result.stdout}")
-        print(f"   stderr: {result.stderr}")
-        return False
-    print(f"   ✓ {result.stdout.strip()}")
+    def make_stage_tool(stage: str, description: str):
+        @tool(stage, description, {"note_id": str})
+        async def stage_tool(args):
+            try:
+                result, resumed = await asyncio.to_thread(run_stage, stage, args["note_id"])
+            except Exception as e:
+                return _tool_result({"error": str(e)}, is_error=True)
+            return _tool_result(dict(result, resumed=resumed))
+        return stage_tool
     
-    print(f"\n✅ 笔记 {note_id} 生成完成!")
-    return True
+    tools = [
+        select_tool,
+        make_stage_tool("prompts", "为笔记生成图片提示词，返回提示词数量和文件路径"),
+        make_stage_tool("images", "根据提示词生成配图，返回成功数和总数"),
+        make_stage_tool("upload", "上传笔记内容和配图到飞书多维表格"),
+        make_stage_tool("log", "将笔记标记为已使用"),
+    ]
+    server = create_sdk_mcp_server(name="xhs", version="1.0.0", tools=tools)
+    tool_names = ["mcp__xhs__select_next_note"] + [f"mcp__xhs__{name}" for name, _ in PIPELINE_STAGES]
+    return server, tool_names
+
+
+def _format_usage(usage) -> str:
+    if not usage:
+        return "tokens: 未知"
+    return (
+        f"输入 {usage.get('input_tokens', 0)} / 输出 {usage.get('output_tokens', 0)} tokens"
+        f" (缓存读取 {usage.get('cache_read_input_tokens', 0)})"
+    )
 
 
 async def run_with_claude():
-    """使用 Claude Agent SDK 运行工作流（智能模式）"""
+    """使用 Claude Agent SDK 运行工作流（智能模式）
+
+    流水线步骤以进程内工具的形式提供给模型，和直接模式共享断点；
+    Agent 未完成时回退到直接模式，从断点继续而不是重新开始。
+    """
     print("🤖 启动 Claude Agent 模式...")
     
+    session = {"note_id": None}
+    server, tool_names = build_pipeline_server(session)
     options = ClaudeAgentOptions(
         system_prompt=get_system_prompt(),
-        max_turns=10,
+        max_turns=MAX_AGENT_TURNS,
+        mcp_servers={"xhs": server},
+        allowed_tools=tool_names,
+        disallowed_tools=DISALLOWED_AGENT_TOOLS,
+        # 需要原始流事件：每次模型调用的 token 用量只在 message_start / message_delta 中提供
+        include_partial_messages=True,
     )
     
-    prompt = """请执行小红书笔记生成工作流：
-1. 运行 `python scripts/select_next_note.py` 选择下一篇笔记
-2. 运行 `python scripts/generate_prompts.py --note_id <ID>` 生成提示词
-3. 运行 `python scripts/generate_images.py --note_id <ID>` 生成图片
-4. 运行 `python scripts/upload_to_feishu.py --note_id <ID>` 上传到飞书
-5. 运行 `python scripts/update_log.py --note_id <ID>` 更新日志
+    prompt = """请执行小红书笔记生成工作流，依次调用工具：
+1. select_next_note 选择笔记
+2. prompts 生成提示词
+3. images 生成图片
+4. upload 上传到飞书
+5. log 更新日志
 
-请依次执行这些步骤，并报告结果。"""
+除 select_next_note 外，每个工具都传入第 1 步返回的 note_id。工具返回 resumed=true 表示该步骤之前已完成。
+任一步骤出错时停止并报告错误，全部完成后用一句话总结。"""
 
+    agent_ok = False
+    turn = 0
+    turn_usage = {}
+    last_time = time.monotonic()
     try:
         async for message in query(prompt=prompt, options=options):
-            if isinstance(message, AssistantMessage):
+            now = time.monotonic()
+            if isinstance(message, StreamEvent):
+                # 每个 message_start 对应一次模型调用，即一轮
+                event = message.event
+                event_type = event.get("type")
+                if event_type == "message_start":
+                    turn += 1
+                    turn_usage = dict(event.get("message", {}).get("usage") or {})
+                elif event_type == "message_delta":
+                    turn_usage.update(event.get("usage") or {})
+                elif event_type == "message_stop":
+                    # 耗时从上一轮结束算起，包含上一轮工具的执行时间
+                    print(f"   ⏱ 第 {turn} 轮: {now - last_time:.2f}s, {_format_usage(turn_usage)}")
+                    last_time = now
+            elif isinstance(message, AssistantMessage):
                 for block in message.content:
                     if isinstance(block, TextBlock):
                         print(block.text)
+            elif isinstance(message, ResultMessage):
+                cost = f"${message.total_cost_usd:.4f}" if message.total_cost_usd is not None else "未知"
+                print(
+                    f"📈 Agent 统计: {message.num_turns} 轮, {message.duration_ms / 1000:.2f}s, "
+                    f"费用 {cost}, {_format_usage(message.usage)}"
+                )
+                agent_ok = not message.is_error
     except Exception as e:
         print(f"Claude Agent 执行出错: {e}")
-        print("回退到直接执行模式...")
-        return await run_workflow()
     
-    return True
+    note_id = session["note_id"]
+    if agent_ok and note_id and get_result(note_id, "log") is not None:
+        print(f"\n✅ 笔记 {note_id} 生成完成!")
+        return True
+    
+    print("Agent 未完成全部步骤，回退到直接执行模式（从断点继续）...")
+    return await run_workflow(note_id)
 
 
 async def main():
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+常驻调度模式：按 cron 表达式或本地队列触发笔记生成工作流
+
+进程常驻后，已解析的笔记、HTTP 连接池和飞书 token 在多次任务之间复用，
+每篇笔记的开销只剩实际的 API 调用。
+
+使用方法:
+    python scheduler.py                       # 默认每天 UTC 12:00 执行
+    python scheduler.py --cron "0 */6 * * *"  # 自定义调度
+    python scheduler.py --no-cron             # 仅处理队列中的任务
+
+本地接口 (默认 127.0.0.1:8765):
+    GET  /health              存活检查
+    GET  /status              调度器状态、队列长度和最近任务
+    GET  /search?q=关键词     检索笔记，返回排序后的笔记 ID
+    POST /run                 加入一次任务，可带 ?note_id=XXX 指定笔记
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# agent_workflow 会把 scripts 目录加入 sys.path
+from agent_workflow import run_workflow, validate_environment
+from note_corpus import load_corpus
+from search_notes import search_notes
+
+DEFAULT_CRON = "0 12 * * *"  # 与 GitHub Actions 一致：UTC 12:00 = 北京时间 20:00
+HISTORY_SIZE = 20
+
+
+class CronSchedule:
+    """五段式 cron 表达式（分 时 日 月 周），时间按 UTC 计算
+
+    支持 `*`、数字、`a-b` 范围、`,` 列表和 `/n` 步长。
+    """
+
+    FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expr: str):
+        parts = expr.split()
+        if len(parts) != 5:
+            raise ValueError(f"cron 表达式需要 5 段: {expr!r}")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse_field(part, low, high) for part, (low, high) in zip(parts, self.FIELDS)
+        )
+        # 与标准 cron 一致：以 * 开头（包括 */n）的日、周字段视为不限
+        self._any_day = parts[2].startswith("*")
+        self._any_weekday = parts[4].startswith("*")
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> set:
+        values = set()
+        for item in field.split(","):
+            step = 1
+            if "/" in item:
+                item, step_str = item.split("/", 1)
+                step = int(step_str)
+            if item == "*":
+                start, end = low, high
+            elif "-" in item:
+                start, end = (int(v) for v in item.split("-", 1))
+            else:
+                start = int(item)
+                end = high if step > 1 else start
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"cron 字段超出范围: {field!r}")
+            values.update(range(start, end + 1, step))
+        # 周日既可写 0 也可写 7，统一为 0
+        if high == 7 and 7 in values:
+            values.discard(7)
+            values.add(0)
+        return values
+
+    def matches(self, dt: datetime) -> bool:
+        if dt.minute not in self.minutes or dt.hour not in self.hours or dt.month not in self.months:
+            return False
+        day_ok = dt.day in self.days
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        # 与标准 cron 一致：日和周都有限制时满足其一即可
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, dt: datetime) -> datetime:
+        """返回严格晚于 dt 的下一个触发时间"""
+        candidate = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if self.matches(candidate):
+                return candidate
+            candidate += timedelta(minutes=1)
+        raise ValueError(f"cron 表达式没有可触发的时间: {self.expr!r}")
+
+
+class Scheduler:
+    """串行执行工作流任务，并记录状态供 /status 查询"""
+
+    def __init__(self, schedule: CronSchedule = None):
+        self.schedule = schedule
+        self.queue = None
+        self.loop = None
+        self.started_at = datetime.now(timezone.utc)
+        self.next_run = None
+        self.current = None
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self._lock = threading.Lock()
+
+    def enqueue(self, note_id: str = None, source: str = "api"):
+        """线程安全地加入一次任务"""
+        job = {"note_id": note_id, "source": source, "queued_at": _now_iso()}
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, job)
+        return job
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "started_at": self.started_at.isoformat(),
+                "cron": self.schedule.expr if self.schedule else None,
+                "next_run": self.next_run.isoformat() if self.next_run else None,
+                "queued": self.queue.qsize() if self.queue else 0,
+                "current": self.current,
+                "history": list(self.history),
+                "notes_loaded": len(load_corpus()),
+            }
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            started = datetime.now(timezone.utc)
+            with self._lock:
+                self.current = dict(job, started_at=started.isoformat())
+            print(f"\n🚀 开始任务 ({job['source']}) 笔记: {job['note_id'] or '自动选择'}")
+            try:
+                success = await run_workflow(job["note_id"])
+                error = None
+            except Exception as e:
+                success, error = False, str(e)
+                print(f"❌ 任务异常: {e}")
+            finished = datetime.now(timezone.utc)
+            with self._lock:
+                self.current = None
+                self.history.append(dict(
+                    job,
+                    started_at=started.isoformat(),
+                    finished_at=finished.isoformat(),
+                    duration_s=round((finished - started).total_seconds(), 2),
+                    success=success,
+                    error=error,
+                ))
+            self.queue.task_done()
+
+    def _next_cron_time(self, now: datetime) -> datetime:
+        """从上一次触发时间之后计算，时钟回拨或提前唤醒时不会重复同一个时间点"""
+        if self.next_run is not None:
+            now = max(now, self.next_run)
+        return self.schedule.next_after(now)
+
+    async def _cron_loop(self):
+        while True:
+            now = datetime.now(timezone.utc)
+            with self._lock:
+                self.next_run = self._next_cron_time(now)
+            print(f"⏰ 下次定时任务: {self.next_run.isoformat()}")
+            await asyncio.sleep(max(0.0, (self.next_run - datetime.now(timezone.utc)).total_seconds()))
+            self.enqueue(source="cron")
+
+    async def run(self, host: str = None, port: int = None):
+        """启动工作线程和定时触发；给出 host 时同时启动状态接口
+
+        状态接口在事件循环和队列创建之后才启动，保证 POST /run 总能入队。
+        """
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        server = None
+        if host is not None:
+            server = start_status_server(self, host, port)
+            print(f"🩺 状态接口: http://{host}:{server.server_address[1]}/status")
+        tasks = [asyncio.create_task(self._worker())]
+        if self.schedule:
+            tasks.append(asyncio.create_task(self._cron_loop()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            if server:
+                server.shutdown()
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def make_handler(scheduler: Scheduler):
+    class StatusHandler(BaseHTTPRequestHandler):
+        def _send_json(self, code: int, data: dict):
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            path = url.path
+            if path == "/health":
+                self._send_json(200, {"status": "ok"})
+            elif path == "/status":
+                self._send_json(200, scheduler.status())
+            elif path == "/search":
+                params = parse_qs(url.query)
+                query = params.get("q", [""])[0]
+                try:
+                    limit = int(params.get("limit", ["10"])[0])
+                except ValueError:
+                    limit = 0
+                if limit < 1:
+                    self._send_json(400, {"error": "limit 必须是正整数"})
+                    return
+                results = search_notes(query, limit)
+                self._send_json(200, {"results": [{"note_id": n, "score": s} for n, s in results]})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != "/run":
+                self._send_json(404, {"error": "not found"})
+                return
+            note_id = parse_qs(url.query).get("note_id", [None])[0]
+            self._send_json(202, scheduler.enqueue(note_id))
+
+        def log_message(self, format, *args):
+            pass
+
+    return StatusHandler
+
+
+def start_status_server(scheduler: Scheduler, host: str, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(scheduler))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="小红书笔记生成常驻调度器")
+    parser.add_argument("--cron", default=os.environ.get("XHS_SCHEDULE_CRON", DEFAULT_CRON),
+                        help=f"cron 表达式 (UTC)，默认 {DEFAULT_CRON}")
+    parser.add_argument("--no-cron", action="store_true", help="关闭定时触发，仅处理队列")
+    parser.add_argument("--host", default="127.0.0.1", help="状态接口监听地址")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("XHS_SCHEDULER_PORT", 8765)),
+                        help="状态接口端口")
+    args = parser.parse_args()
+
+    if not validate_environment():
+        sys.exit(1)
+
+    schedule = None if args.no_cron else CronSchedule(args.cron)
+    scheduler = Scheduler(schedule)
+
+    # 预热：解析全部笔记并同步检索索引
+    print(f"📚 已加载 {len(load_corpus())} 篇笔记")
+    search_notes("")
+
+    await scheduler.run(args.host, args.port)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n已停止")
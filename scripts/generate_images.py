@@ -4,17 +4,23 @@ import argparse
 import base64
 import json
 import os
+import shutil
 import time
 from pathlib import Path
 
 import requests
 
+from similarity import refresh_image_reuse
+
 OUTPUT_DIR = Path(__file__).parent.parent / "output"
 
 # AllAPI 配置
 ALLAPI_BASE_URL = "https://allapi.store"
 MODEL_NAME = "gemini-3-pro-image-preview"
 
+# 复用 HTTP 连接池，常驻模式下多篇笔记之间也保持连接
+SESSION = requests.Session()
+
 
 def generate_image(api_key: str, prompt: str, output_path: str, max_retries: int = 3) -> bool:
     """使用 AllAPI Gemini 模型生成图片"""
@@ -46,7 +52,7 @@ def generate_image(api_key: str, prompt: str, output_path: str, max_retries: int
     
     for attempt in range(max_retries):
         try:
-            response = requests.post(endpoint, headers=headers, json=payload, timeout=180)
+            response = SESSION.post(endpoint, headers=headers, json=payload, timeout=180)
             
             if response.status_code == 200:
                 data = response.json()
@@ -107,24 +113,17 @@ def generate_image(api_key: str, prompt: str, output_path: str, max_retries: int
     return False
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--note_id', required=True, help='笔记 ID')
-    args = parser.parse_args()
-    
-    # 检查 API Key
-    api_key = os.environ.get("ALLAPI_API_KEY")
+def generate_note_images(note_id: str, api_key: str = None) -> tuple:
+    """为笔记生成全部配图，返回 (成功数, 总数)"""
+    api_key = api_key or os.environ.get("ALLAPI_API_KEY")
     if not api_key:
-        print("错误: 缺少 ALLAPI_API_KEY 环境变量")
-        exit(1)
+        raise RuntimeError("缺少 ALLAPI_API_KEY 环境变量")
     
-    note_id = args.note_id
     prompts_file = OUTPUT_DIR / f"note{note_id}_prompts" / "prompts.json"
     images_dir = OUTPUT_DIR / f"note{note_id}_images"
     
     if not prompts_file.exists():
-        print(f"错误: 找不到提示词文件 {prompts_file}")
-        exit(1)
+        raise FileNotFoundError(f"找不到提示词文件 {prompts_file}")
     
     images_dir.mkdir(parents=True, exist_ok=True)
     
@@ -133,12 +132,27 @@ def main():
     
     print(f"开始生成 {len(prompts)} 张图片 (使用 AllAPI {MODEL_NAME})...")
     
+    # 配图说明与其他笔记近乎相同、且对方已有配图的页面直接复用；
+    # 每次生成前刷新，常驻模式下新生成的配图也能作为复用来源
+    try:
+        reuse = refresh_image_reuse()
+    except OSError as e:
+        print(f"  ✗ 刷新相似度报告失败，不复用配图: {e}")
+        reuse = {}
+    
     success_count = 0
     for i, prompt_data in enumerate(prompts, 1):
         page = prompt_data.get('page', str(i))
         prompt = prompt_data.get('prompt', '')
         output_path = str(images_dir / f"p{page}.png")
         
+        source = reuse.get(f"{note_id}/P{page}")
+        if source and os.path.exists(source):
+            shutil.copyfile(source, output_path)
+            print(f"[{i}/{len(prompts)}] ↺ 复用相似配图 P{page} <- {source}")
+            success_count += 1
+            continue
+        
         print(f"[{i}/{len(prompts)}] 生成 P{page}...")
         
         if generate_image(api_key, prompt, output_path):
@@ -151,6 +165,19 @@ def main():
             time.sleep(3)
     
     print(f"\n完成: 成功生成 {success_count}/{len(prompts)} 张图片")
+    return success_count, len(prompts)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--note_id', required=True, help='笔记 ID')
+    args = parser.parse_args()
+    
+    try:
+        success_count, _ = generate_note_images(args.note_id)
+    except (RuntimeError, FileNotFoundError) as e:
+        print(f"错误: {e}")
+        exit(1)
     
     # 如果成功生成超过一半，也算成功
     if success_count == 0:
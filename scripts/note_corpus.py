@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""解析笔记文件，按文件修改时间缓存解析结果"""
+import os
+import re
+import threading
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+NOTES_DIR = os.path.join(DATA_DIR, 'notes')
+
+NOTE_HEADER_RE = re.compile(r'^## 【笔记(\d{3})】', re.MULTILINE)
+
+# {filepath: (mtime, {note_id: note})}
+_file_cache = {}
+# 常驻模式下工作线程和 HTTP 线程会同时读取缓存
+_cache_lock = threading.RLock()
+
+
+def _split_keywords(value):
+    return [k.strip() for k in re.split(r'[、,，]', value) if k.strip()]
+
+
+def parse_note_section(note_id, note_section):
+    """从单篇笔记的 Markdown 片段中提取字段"""
+    def field(name):
+        match = re.search(rf'- \*\*{name}\*\*：(.+)', note_section)
+        return match.group(1).strip() if match else ""
+
+    # 提取标题
+    titles = [field(f'标题{c}') for c in 'ABC']
+    title = titles[0] or f"笔记{note_id}"
+
+    # 提取正文
+    content_match = re.search(r'### 正文内容\s*\n(.*?)\n### 配图说明', note_section, re.DOTALL)
+    main_content = content_match.group(1).strip() if content_match else ""
+
+    # 提取配图说明
+    images_match = re.search(r'### 配图说明\s*\n(.*?)(?=\n###|\Z)', note_section, re.DOTALL)
+    images_desc = images_match.group(1).strip() if images_match else ""
+
+    # 提取话题标签
+    tags_match = re.search(r'### 话题标签\s*\n```\s*\n(.+?)\n```', note_section, re.DOTALL)
+    if tags_match:
+        tags = [t.strip() for t in tags_match.group(1).strip().split('#') if t.strip()]
+    else:
+        tags = []
+
+    return {
+        "note_id": note_id,
+        "title": title,
+        "titles": [t for t in titles if t],
+        "keywords": _split_keywords(field('核心关键词')),
+        "long_tail_keywords": _split_keywords(field('长尾关键词')),
+        "content": main_content,
+        "images_desc": images_desc,
+        "tags": tags,
+        "note_section": note_section,
+    }
+
+
+def parse_note_file(filepath):
+    """解析一个笔记文件中的全部笔记"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    notes = {}
+    headers = list(NOTE_HEADER_RE.finditer(content))
+    for i, match in enumerate(headers):
+        end_idx = headers[i + 1].start() if i + 1 < len(headers) else len(content)
+        note_id = match.group(1)
+        note = parse_note_section(note_id, content[match.start():end_idx].rstrip('\n'))
+        note["source_file"] = os.path.basename(filepath)
+        notes[note_id] = note
+    return notes
+
+
+def list_note_files():
+    """列出笔记目录下的 Markdown 文件"""
+    return [
+        os.path.join(NOTES_DIR, filename)
+        for filename in sorted(os.listdir(NOTES_DIR))
+        if filename.endswith('.md')
+    ]
+
+
+def load_file_notes(filepath):
+    """返回 (mtime, {note_id: note})，文件未修改时直接使用缓存"""
+    with _cache_lock:
+        mtime = os.path.getmtime(filepath)
+        cached = _file_cache.get(filepath)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, parse_note_file(filepath))
+            _file_cache[filepath] = cached
+        return cached
+
+
+def load_corpus():
+    """加载全部笔记，仅重新解析修改过的文件
+
+    返回按笔记 ID 排序的 {note_id: note} 字典。
+    """
+    with _cache_lock:
+        files = list_note_files()
+        for filepath in list(_file_cache):
+            if filepath not in files:
+                del _file_cache[filepath]
+
+        corpus = {}
+        for filepath in files:
+            _, notes = load_file_notes(filepath)
+            for note_id, note in notes.items():
+                # 与原先按文件顺序查找一致：同一 ID 以第一个文件为准
+                corpus.setdefault(note_id, note)
+    return dict(sorted(corpus.items()))
+
+
+def get_note(note_id):
+    """获取单篇笔记，不存在时返回 None"""
+    return load_corpus().get(note_id)
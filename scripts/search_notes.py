@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""笔记关键词检索：基于倒排索引，中文按单字和字符二元组切分，BM25 排序
+
+使用方法:
+    python scripts/search_notes.py 盐城 选岗
+    python scripts/search_notes.py "事业单位 公务员" --limit 5
+    python scripts/search_notes.py 选岗 --rebuild   # 忽略缓存重建索引
+
+索引缓存在 data/search_index.json，笔记文件修改后只重建该文件中的笔记。
+"""
+import argparse
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from note_corpus import list_note_files, load_file_notes
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+INDEX_FILE = os.path.join(DATA_DIR, 'search_index.json')
+INDEX_VERSION = 3
+
+# 各字段的词频权重：关键词和标题命中比正文命中更重要
+FIELD_WEIGHTS = {
+    "keywords": 3.0,
+    "long_tail_keywords": 2.5,
+    "titles": 2.0,
+    "tags": 2.0,
+    "content": 1.0,
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+CJK_RE = re.compile(r'[一-鿿]+')
+WORD_RE = re.compile(r'[一-鿿]+|[a-z0-9]+')
+
+
+def tokenize(text, unigrams=False):
+    """切分文本：中文连续片段取字符二元组（单字片段保留单字），英文和数字按词
+
+    unigrams=True 时中文片段额外输出每个单字，建索引时使用，单字检索也能命中。
+    """
+    tokens = []
+    for run in WORD_RE.findall(text.lower()):
+        if CJK_RE.fullmatch(run):
+            if len(run) == 1:
+                tokens.append(run)
+                continue
+            if unigrams:
+                tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def note_term_weights(note):
+    """计算一篇笔记各词项的加权词频"""
+    weights = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        value = note.get(field) or ""
+        if isinstance(value, list):
+            value = " ".join(value)
+        for token in tokenize(value, unigrams=True):
+            weights[token] += weight
+    return weights
+
+
+class NoteIndex:
+    """倒排索引，按笔记文件增量更新"""
+
+    def __init__(self):
+        self.postings = {}   # {term: {note_id: 加权词频}}
+        self.doc_len = {}    # {note_id: 加权长度}
+        self.titles = {}     # {note_id: 标题}
+        self.files = {}      # {文件名: {"mtime": ..., "ids": 文件中全部 ID, "notes": 由该文件索引的 ID}}
+        self.total_len = 0.0
+
+    def add_note(self, note):
+        note_id = note["note_id"]
+        if note_id in self.doc_len:
+            # 重复 ID 由 refresh 决定归属，这里只保留已索引的版本
+            return False
+        weights = note_term_weights(note)
+        for term, tf in weights.items():
+            self.postings.setdefault(term, {})[note_id] = tf
+        length = sum(weights.values())
+        self.doc_len[note_id] = length
+        self.titles[note_id] = note["title"]
+        self.total_len += length
+        return True
+
+    def remove_notes(self, note_ids):
+        """删除一批笔记，只遍历一次词表"""
+        note_ids = {note_id for note_id in note_ids if note_id in self.doc_len}
+        if not note_ids:
+            return
+        for term in list(self.postings):
+            docs = self.postings[term]
+            for note_id in note_ids & docs.keys():
+                del docs[note_id]
+            if not docs:
+                del self.postings[term]
+        for note_id in note_ids:
+            self.total_len -= self.doc_len.pop(note_id)
+            self.titles.pop(note_id, None)
+
+    def refresh(self):
+        """同步笔记目录的变化，返回是否有更新"""
+        current = {os.path.basename(path): path for path in list_note_files()}
+        changed = [
+            name for name, path in current.items()
+            if self.files.get(name, {}).get("mtime") != os.path.getmtime(path)
+        ]
+        removed = [name for name in self.files if name not in current]
+        if not changed and not removed:
+            return False
+
+        stale = []
+        for name in changed + removed:
+            stale.extend(self.files.pop(name, {}).get("notes", []))
+        self.remove_notes(stale)
+        for name in changed:
+            mtime, notes = load_file_notes(current[name])
+            self.files[name] = {"mtime": mtime, "ids": list(notes), "notes": []}
+
+        # 与 note_corpus.load_corpus 一致：同一 ID 以文件名排序最前的文件为准
+        owners = {}
+        for name in sorted(current):
+            for note_id in self.files[name].get("ids", []):
+                owners.setdefault(note_id, name)
+
+        # 归属变化的笔记（例如新增了排序更靠前的文件）先删除，再从新文件加入
+        moved = [
+            (note_id, name)
+            for name, entry in self.files.items()
+            for note_id in entry["notes"]
+            if owners.get(note_id) != name
+        ]
+        self.remove_notes(note_id for note_id, _ in moved)
+        for note_id, name in moved:
+            self.files[name]["notes"].remove(note_id)
+
+        to_add = {}
+        for note_id, name in owners.items():
+            if note_id not in self.doc_len:
+                to_add.setdefault(name, []).append(note_id)
+        for name, note_ids in sorted(to_add.items()):
+            _, notes = load_file_notes(current[name])
+            for note_id in note_ids:
+                if self.add_note(notes[note_id]):
+                    self.files[name]["notes"].append(note_id)
+        return True
+
+    def search(self, query, limit=10):
+        """返回按 BM25 得分排序的 [(note_id, score), ...]"""
+        if not self.doc_len:
+            return []
+        n_docs = len(self.doc_len)
+        avg_len = self.total_len / n_docs
+        scores = Counter()
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for note_id, tf in docs.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[note_id] / avg_len)
+                scores[note_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(note_id, round(score, 4)) for note_id, score in ranked[:limit]]
+
+    def to_dict(self):
+        return {
+            "version": INDEX_VERSION,
+            "postings": self.postings,
+            "doc_len": self.doc_len,
+            "titles": self.titles,
+            "files": self.files,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        if data.get("version") != INDEX_VERSION:
+            return index
+        index.postings = data["postings"]
+        index.doc_len = data["doc_len"]
+        index.titles = data["titles"]
+        index.files = data["files"]
+        index.total_len = sum(index.doc_len.values())
+        return index
+
+
+_index = None
+# 常驻模式下多个 HTTP 线程会同时检索，索引的刷新和查询都需要加锁
+_index_lock = threading.RLock()
+
+
+def _write_index(index):
+    """先写临时文件再替换，避免并发写入或中断留下损坏的缓存"""
+    index_dir = os.path.dirname(INDEX_FILE)
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=index_dir,
+                                     suffix='.tmp', delete=False) as f:
+        json.dump(index.to_dict(), f, ensure_ascii=False)
+    os.replace(f.name, INDEX_FILE)
+
+
+def load_index(rebuild=False):
+    """加载索引并同步笔记变化；有变化时写回缓存文件"""
+    global _index
+    with _index_lock:
+        if rebuild:
+            _index = NoteIndex()
+        elif _index is None:
+            _index = NoteIndex()
+            if os.path.exists(INDEX_FILE):
+                try:
+                    with open(INDEX_FILE, 'r', encoding='utf-8') as f:
+                        _index = NoteIndex.from_dict(json.load(f))
+                except (ValueError, KeyError):
+                    _index = NoteIndex()
+
+        if _index.refresh() or rebuild:
+            _write_index(_index)
+        return _index
+
+
+def search_notes(query, limit=10):
+    """检索笔记，返回 [(note_id, score), ...]"""
+    with _index_lock:
+        return load_index().search(query, limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按关键词检索笔记')
+    parser.add_argument('query', nargs='+', help='检索词')
+    parser.add_argument('--limit', type=int, default=10, help='返回条数')
+    parser.add_argument('--rebuild', action='store_true', help='忽略缓存重建索引')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出')
+    args = parser.parse_args()
+
+    index = load_index(rebuild=args.rebuild)
+    start = time.perf_counter()
+    results = index.search(" ".join(args.query), args.limit)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    if args.json:
+        print(json.dumps([{"note_id": n, "score": s} for n, s in results], ensure_ascii=False))
+        return
+
+    for note_id, score in results:
+        print(f"{note_id}  {score:>8.3f}  {index.titles.get(note_id, '')}")
+    print(f"共 {len(results)} 条结果，检索耗时 {elapsed_ms:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
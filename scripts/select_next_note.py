@@ -2,11 +2,11 @@
 """选择下一篇未使用的笔记"""
 import json
 import os
-import re
 import sys
 
+from note_corpus import load_corpus
+
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
-NOTES_DIR = os.path.join(DATA_DIR, 'notes')
 LOG_FILE = os.path.join(DATA_DIR, 'usage_log.json')
 
 def get_used_notes():
@@ -19,17 +19,7 @@ def get_used_notes():
 
 def get_all_note_ids():
     """从笔记文件中提取所有笔记 ID"""
-    note_ids = []
-    for filename in sorted(os.listdir(NOTES_DIR)):
-        if not filename.endswith('.md'):
-            continue
-        filepath = os.path.join(NOTES_DIR, filename)
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        # 匹配 ## 【笔记XXX】 格式
-        matches = re.findall(r'## 【笔记(\d{3})】', content)
-        note_ids.extend(matches)
-    return sorted(note_ids)
+    return list(load_corpus())
 
 def select_next_note():
     """选择下一篇未使用的笔记"""
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""笔记与配图的近似重复检测
+
+- 正文内容：字符 3-gram 的 MinHash 签名，LSH 分段找候选对，再按估计的 Jaccard 相似度过滤
+- 配图说明：每页描述的 64 位 SimHash，按汉明距离分段找候选对
+- 已生成的配图：64 位差值哈希 (dHash)，需要安装 Pillow，未安装时跳过
+
+分段 (banding) 只比较落在同一个桶里的候选对，全量扫描接近线性而不是两两比较。
+报告中的 image_reuse 记录了哪些页面可以直接复用已有配图；generate_images.py 每次生成前
+会按当前笔记和已有配图刷新这一部分 (refresh_image_reuse)，耗时远小于一次图片生成。
+
+使用方法:
+    python scripts/similarity.py
+    python scripts/similarity.py --text-threshold 0.5 --max-distance 4
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from note_corpus import load_corpus
+from search_notes import tokenize
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+OUTPUT_DIR = os.path.join(ROOT_DIR, 'output')
+REPORT_FILE = os.path.join(OUTPUT_DIR, 'similarity_report.json')
+
+# MinHash：64 个哈希函数分成 16 段 x 4 行，Jaccard 约 0.5 以上的笔记大概率进入同一个桶
+MINHASH_PERM = 64
+MINHASH_BANDS = 16
+MINHASH_SEED = 20260119
+SHINGLE_SIZE = 3
+MERSENNE_PRIME = (1 << 61) - 1
+
+TEXT_THRESHOLD = 0.6      # 正文估计 Jaccard 相似度阈值
+DESC_MAX_DISTANCE = 3     # 配图说明 SimHash 汉明距离阈值，不超过此值视为近乎相同
+IMAGE_MAX_DISTANCE = 6    # 配图 dHash 汉明距离阈值
+
+_rng = random.Random(MINHASH_SEED)
+_PERMUTATIONS = [
+    (_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+    for _ in range(MINHASH_PERM)
+]
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def _normalize(text):
+    """只保留汉字、字母和数字，忽略排版符号和 emoji"""
+    return ''.join(re.findall(r'[一-鿿a-z0-9]', text.lower()))
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    text = _normalize(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash(text):
+    """返回 MINHASH_PERM 个整数组成的 MinHash 签名，空文本返回 None"""
+    hashes = [_hash64(s) & MERSENNE_PRIME for s in shingles(text)]
+    if not hashes:
+        return None
+    return [min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def minhash_similarity(sig_a, sig_b):
+    """用签名中相同位置的比例估计 Jaccard 相似度"""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+def simhash(text):
+    """64 位 SimHash，特征为 search_notes.tokenize 的切分结果"""
+    features = Counter(tokenize(text))
+    if not features:
+        return None
+    vector = [0] * 64
+    for feature, weight in features.items():
+        h = _hash64(feature)
+        for bit in range(64):
+            vector[bit] += weight if h >> bit & 1 else -weight
+    return sum(1 << bit for bit in range(64) if vector[bit] > 0)
+
+
+def dhash(image_path):
+    """64 位差值哈希，未安装 Pillow 时返回 None"""
+    if Image is None:
+        return None
+    with Image.open(image_path) as img:
+        pixels = img.convert('L').resize((9, 8)).tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            value = value << 1 | (left > pixels[row * 9 + col + 1])
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def minhash_candidates(signatures, bands=MINHASH_BANDS):
+    """MinHash LSH：任意一段完全相同的两项成为候选对"""
+    rows = len(next(iter(signatures.values()))) // bands if signatures else 0
+    buckets = defaultdict(list)
+    for key, sig in signatures.items():
+        for band in range(bands):
+            buckets[(band, tuple(sig[band * rows:(band + 1) * rows]))].append(key)
+    return _pairs_from_buckets(buckets)
+
+
+def hamming_candidates(hashes, max_distance, bits=64):
+    """汉明距离 LSH：分成 max_distance + 1 段，距离不超过阈值的两项至少有一段完全相同"""
+    bands = max_distance + 1
+    width = bits // bands
+    buckets = defaultdict(list)
+    for key, value in hashes.items():
+        for band in range(bands):
+            shift = band * width
+            mask_bits = bits - shift if band == bands - 1 else width
+            buckets[(band, value >> shift & ((1 << mask_bits) - 1))].append(key)
+    return _pairs_from_buckets(buckets)
+
+
+def _pairs_from_buckets(buckets):
+    pairs = set()
+    for keys in buckets.values():
+        if len(keys) < 2:
+            continue
+        keys = sorted(keys)
+        for i in range(len(keys)):
+            for j in range(i + 1, len(keys)):
+                pairs.add((keys[i], keys[j]))
+    return pairs
+
+
+def page_descriptions(note):
+    """解析配图说明，返回 {页码: 描述}"""
+    pages = {}
+    for line in note.get('images_desc', '').splitlines():
+        match = re.match(r'- P(\d+)：(.+)', line.strip())
+        if match:
+            pages[match.group(1)] = match.group(2).strip()
+    return pages
+
+
+def image_path(note_id, page):
+    return os.path.join(OUTPUT_DIR, f"note{note_id}_images", f"p{page}.png")
+
+
+def _relpath(path):
+    return os.path.relpath(path, ROOT_DIR).replace(os.sep, '/')
+
+
+def find_similar_notes(corpus, threshold=TEXT_THRESHOLD):
+    signatures = {}
+    for note_id, note in corpus.items():
+        sig = minhash(note.get('content', ''))
+        if sig:
+            signatures[note_id] = sig
+
+    pairs = []
+    for a, b in minhash_candidates(signatures):
+        similarity = minhash_similarity(signatures[a], signatures[b])
+        if similarity >= threshold:
+            pairs.append({"a": a, "b": b, "similarity": round(similarity, 3)})
+    return sorted(pairs, key=lambda p: (-p["similarity"], p["a"], p["b"]))
+
+
+def find_similar_pages(corpus, max_distance=DESC_MAX_DISTANCE):
+    """返回 (相似页面对, 可复用配图映射)"""
+    hashes, descriptions = {}, {}
+    for note_id, note in corpus.items():
+        for page, desc in page_descriptions(note).items():
+            h = simhash(desc)
+            if h is not None:
+                hashes[(note_id, page)] = h
+                descriptions[(note_id, page)] = desc
+
+    pairs = []
+    neighbours = defaultdict(list)
+    for a, b in hamming_candidates(hashes, max_distance):
+        if a[0] == b[0]:
+            continue
+        distance = hamming(hashes[a], hashes[b])
+        if distance <= max_distance:
+            pairs.append({
+                "a": f"{a[0]}/P{a[1]}", "b": f"{b[0]}/P{b[1]}", "distance": distance,
+                "description_a": descriptions[a], "description_b": descriptions[b],
+            })
+            neighbours[a].append((distance, b))
+            neighbours[b].append((distance, a))
+
+    # 对每个页面，选择距离最近、且已有配图的其他笔记页面作为复用来源
+    reuse = {}
+    for key, candidates in neighbours.items():
+        for distance, other in sorted(candidates):
+            path = image_path(*other)
+            if os.path.exists(path):
+                reuse[f"{key[0]}/P{key[1]}"] = {"source": _relpath(path), "distance": distance}
+                break
+
+    pairs.sort(key=lambda p: (p["distance"], p["a"], p["b"]))
+    return pairs, dict(sorted(reuse.items()))
+
+
+def find_similar_images(max_distance=IMAGE_MAX_DISTANCE):
+    """返回相似配图对；未安装 Pillow 时返回 None"""
+    if Image is None:
+        return None
+    hashes = {}
+    for path in sorted(glob.glob(os.path.join(OUTPUT_DIR, "note*_images", "p*.png"))):
+        try:
+            hashes[_relpath(path)] = dhash(path)
+        except OSError as e:
+            print(f"  ✗ 无法读取图片 {path}: {e}")
+
+    pairs = []
+    for a, b in hamming_candidates(hashes, max_distance):
+        distance = hamming(hashes[a], hashes[b])
+        if distance <= max_distance:
+            pairs.append({"a": a, "b": b, "distance": distance})
+    return sorted(pairs, key=lambda p: (p["distance"], p["a"], p["b"]))
+
+
+def build_report(text_threshold=TEXT_THRESHOLD, desc_max_distance=DESC_MAX_DISTANCE,
+                 image_max_distance=IMAGE_MAX_DISTANCE):
+    corpus = load_corpus()
+    page_pairs, reuse = find_similar_pages(corpus, desc_max_distance)
+    return {
+        "generated_at": datetime.now().isoformat(),
+        "notes": len(corpus),
+        "desc_max_distance": desc_max_distance,
+        "note_pairs": find_similar_notes(corpus, text_threshold),
+        "page_pairs": page_pairs,
+        "image_pairs": find_similar_images(image_max_distance),
+        "image_reuse": reuse,
+    }
+
+
+def save_report(report):
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    with open(REPORT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return REPORT_FILE
+
+
+def load_report():
+    """读取报告，不存在或已损坏时返回 None"""
+    if not os.path.exists(REPORT_FILE):
+        return None
+    try:
+        with open(REPORT_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except ValueError as e:
+        print(f"  ✗ 相似度报告已损坏，忽略: {e}")
+        return None
+
+
+def _absolute_reuse(reuse):
+    return {key: os.path.join(ROOT_DIR, entry["source"]) for key, entry in reuse.items()}
+
+
+def refresh_image_reuse():
+    """按当前配图说明和已有配图重算报告中的 page_pairs 和 image_reuse
+
+    返回可复用配图映射 {"<note_id>/P<page>": 图片绝对路径}。只计算 SimHash 部分，
+    不重新计算正文 MinHash 和配图感知哈希。
+    """
+    report = load_report() or {"note_pairs": [], "image_pairs": None}
+    max_distance = report.get("desc_max_distance", DESC_MAX_DISTANCE)
+    corpus = load_corpus()
+    page_pairs, reuse = find_similar_pages(corpus, max_distance)
+    report.update({
+        "generated_at": datetime.now().isoformat(),
+        "notes": len(corpus),
+        "desc_max_distance": max_distance,
+        "page_pairs": page_pairs,
+        "image_reuse": reuse,
+    })
+    save_report(report)
+    return _absolute_reuse(reuse)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检测近似重复的笔记和配图')
+    parser.add_argument('--text-threshold', type=float, default=TEXT_THRESHOLD, help='正文相似度阈值 (0-1)')
+    parser.add_argument('--max-distance', type=int, default=DESC_MAX_DISTANCE, help='配图说明 SimHash 汉明距离阈值')
+    parser.add_argument('--image-distance', type=int, default=IMAGE_MAX_DISTANCE, help='配图 dHash 汉明距离阈值')
+    args = parser.parse_args()
+
+    report = build_report(args.text_threshold, args.max_distance, args.image_distance)
+    report_file = save_report(report)
+
+    print(f"相似笔记: {len(report['note_pairs'])} 对")
+    for pair in report['note_pairs'][:10]:
+        print(f"  {pair['a']} ~ {pair['b']}  {pair['similarity']:.2f}")
+    print(f"相似配图说明: {len(report['page_pairs'])} 对，可复用已有配图的页面: {len(report['image_reuse'])} 个")
+    if report['image_pairs'] is None:
+        print("未安装 Pillow，跳过配图感知哈希 (pip install pillow)")
+    else:
+        print(f"相似配图: {len(report['image_pairs'])} 对")
+    print(f"报告已保存: {report_file}")
+
+
+if __name__ == '__main__':
+    main()
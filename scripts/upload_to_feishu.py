@@ -4,68 +4,45 @@ import argparse
 import glob
 import json
 import os
-import re
+import time
+
 import requests
 
+from note_corpus import get_note
+
 # 从环境变量读取配置
 APP_ID = os.environ.get('FEISHU_APP_ID')
 APP_SECRET = os.environ.get('FEISHU_APP_SECRET')
 APP_TOKEN = os.environ.get('FEISHU_APP_TOKEN')
 TABLE_ID = os.environ.get('FEISHU_TABLE_ID')
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
-NOTES_DIR = os.path.join(DATA_DIR, 'notes')
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'output')
 
+# 复用 HTTP 连接池；token 在有效期内缓存，常驻模式下无需每篇笔记重新获取
+SESSION = requests.Session()
+_token_cache = {"token": None, "expires_at": 0.0}
+TOKEN_REFRESH_MARGIN = 300
+
 def get_tenant_access_token():
-    """获取飞书 tenant_access_token"""
+    """获取飞书 tenant_access_token（有效期内复用缓存）"""
+    if _token_cache["token"] and time.time() < _token_cache["expires_at"]:
+        return _token_cache["token"]
+    
     url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
     headers = {"Content-Type": "application/json; charset=utf-8"}
     payload = {"app_id": APP_ID, "app_secret": APP_SECRET}
     
-    resp = requests.post(url, headers=headers, json=payload)
+    resp = SESSION.post(url, headers=headers, json=payload)
     if resp.status_code == 200 and resp.json().get("code") == 0:
-        return resp.json()["tenant_access_token"]
+        data = resp.json()
+        _token_cache["token"] = data["tenant_access_token"]
+        _token_cache["expires_at"] = time.time() + data.get("expire", 0) - TOKEN_REFRESH_MARGIN
+        return data["tenant_access_token"]
     raise Exception(f"获取 token 失败: {resp.text}")
 
 def parse_note_content(note_id):
     """解析笔记内容"""
-    note_pattern = f"## 【笔记{note_id}】"
-    
-    for filename in sorted(os.listdir(NOTES_DIR)):
-        if not filename.endswith('.md'):
-            continue
-        filepath = os.path.join(NOTES_DIR, filename)
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        if note_pattern not in content:
-            continue
-        
-        start_idx = content.find(note_pattern)
-        next_match = re.search(r'\n## 【笔记\d{3}】', content[start_idx + len(note_pattern):])
-        end_idx = start_idx + len(note_pattern) + next_match.start() if next_match else len(content)
-        note_section = content[start_idx:end_idx]
-        
-        # 提取标题
-        title_match = re.search(r'- \*\*标题A\*\*：(.+)', note_section)
-        title = title_match.group(1).strip() if title_match else f"笔记{note_id}"
-        
-        # 提取正文
-        content_match = re.search(r'### 正文内容\s*\n(.*?)\n### 配图说明', note_section, re.DOTALL)
-        main_content = content_match.group(1).strip() if content_match else ""
-        
-        # 提取话题标签
-        tags_match = re.search(r'### 话题标签\s*\n```\s*\n(.+?)\n```', note_section, re.DOTALL)
-        if tags_match:
-            tags_str = tags_match.group(1).strip()
-            tags = [t.strip() for t in tags_str.split('#') if t.strip()]
-        else:
-            tags = []
-        
-        return {"title": title, "content": main_content, "tags": tags}
-    
-    return None
+    return get_note(note_id)
 
 def upload_images(access_token, note_id):
     """上传图片到飞书"""
@@ -92,7 +69,7 @@ def upload_images(access_token, note_id):
                 'parent_node': APP_TOKEN,
                 'size': str(size)
             }
-            resp = requests.post(url, headers=headers, files=files, data=data)
+            resp = SESSION.post(url, headers=headers, files=files, data=data)
             
             if resp.status_code == 200 and resp.json().get('code') == 0:
                 file_token = resp.json()['data']['file_token']
@@ -119,7 +96,7 @@ def create_or_update_record(access_token, note_id, note_data, files_tokens):
         }
     }
     
-    resp = requests.post(search_url, headers=headers, json=payload)
+    resp = SESSION.post(search_url, headers=headers, json=payload)
     items = resp.json().get('data', {}).get('items', [])
     
     fields = {
@@ -135,37 +112,25 @@ def create_or_update_record(access_token, note_id, note_data, files_tokens):
         # 更新现有记录
         record_id = items[0]['record_id']
         update_url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{APP_TOKEN}/tables/{TABLE_ID}/records/{record_id}"
-        resp = requests.put(update_url, headers=headers, json={"fields": fields})
+        resp = SESSION.put(update_url, headers=headers, json={"fields": fields})
         print(f"✓ 更新记录 {record_id}")
     else:
         # 创建新记录
         create_url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{APP_TOKEN}/tables/{TABLE_ID}/records"
-        resp = requests.post(create_url, headers=headers, json={"fields": fields})
+        resp = SESSION.post(create_url, headers=headers, json={"fields": fields})
         record_id = resp.json().get('data', {}).get('record', {}).get('record_id')
         print(f"✓ 创建记录 {record_id}")
     
     return resp.json()
 
-def main():
-    # 验证环境变量
-    required_vars = ['FEISHU_APP_ID', 'FEISHU_APP_SECRET', 'FEISHU_APP_TOKEN', 'FEISHU_TABLE_ID']
-    missing = [v for v in required_vars if not os.environ.get(v)]
-    if missing:
-        print(f"错误: 缺少环境变量 {missing}")
-        exit(1)
-    
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--note_id', required=True, help='笔记 ID')
-    args = parser.parse_args()
-    
-    note_id = args.note_id
+def upload_note(note_id):
+    """上传笔记内容和图片，返回飞书接口响应"""
     print(f"处理笔记 {note_id}...")
     
     # 解析笔记内容
     note_data = parse_note_content(note_id)
     if not note_data:
-        print(f"错误: 找不到笔记 {note_id}")
-        exit(1)
+        raise ValueError(f"找不到笔记 {note_id}")
     
     print(f"  标题: {note_data['title'][:40]}...")
     
@@ -180,10 +145,27 @@ def main():
     print("更新飞书记录...")
     result = create_or_update_record(access_token, note_id, note_data, files_tokens)
     
-    if result.get('code') == 0:
-        print("✓ 完成!")
-    else:
-        print(f"✗ 失败: {result}")
+    if result.get('code') != 0:
+        raise Exception(f"失败: {result}")
+    print("✓ 完成!")
+    return result
+
+def main():
+    # 验证环境变量
+    required_vars = ['FEISHU_APP_ID', 'FEISHU_APP_SECRET', 'FEISHU_APP_TOKEN', 'FEISHU_TABLE_ID']
+    missing = [v for v in required_vars if not os.environ.get(v)]
+    if missing:
+        print(f"错误: 缺少环境变量 {missing}")
+        exit(1)
+    
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--note_id', required=True, help='笔记 ID')
+    args = parser.parse_args()
+    
+    try:
+        upload_note(args.note_id)
+    except Exception as e:
+        print(f"✗ {e}")
         exit(1)
 
 if __name__ == '__main__':
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""工作流断点状态：记录当前笔记已完成的步骤，供直接模式和 Agent 模式共享"""
+import json
+import os
+from datetime import datetime
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+STATE_FILE = os.path.join(DATA_DIR, 'workflow_state.json')
+
+STAGES = ["select", "prompts", "images", "upload", "log"]
+
+
+def load_state():
+    """读取断点状态，不存在时返回空状态"""
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {"note_id": None, "completed": {}}
+
+
+def save_state(state):
+    state['last_updated'] = datetime.now().isoformat()
+    with open(STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+
+def is_complete(state):
+    """当前笔记的全部步骤是否已完成"""
+    return all(stage in state.get('completed', {}) for stage in STAGES)
+
+
+def pending_note_id():
+    """返回自动选择后未完成的笔记 ID，没有则返回 None
+
+    手动指定的笔记失败后不会被自动续跑，避免一次失败的手动任务占住后续的定时任务。
+    """
+    state = load_state()
+    if state.get('note_id') and state.get('auto') and not is_complete(state):
+        return state['note_id']
+    return None
+
+
+def start_note(note_id, auto=False):
+    """开始处理一篇笔记；如果是同一篇未完成的笔记则保留已完成的步骤
+
+    auto 表示笔记是自动选择的，只有这类笔记会被 pending_note_id 续跑。
+    """
+    state = load_state()
+    if state.get('note_id') != note_id or is_complete(state):
+        state = {"note_id": note_id, "auto": auto, "completed": {}}
+    else:
+        state['auto'] = state.get('auto', False) or auto
+    save_state(state)
+    return state
+
+
+def get_result(note_id, stage):
+    """返回某步骤已记录的结果，未完成时返回 None"""
+    state = load_state()
+    if state.get('note_id') != note_id:
+        return None
+    return state.get('completed', {}).get(stage)
+
+
+def mark_done(note_id, stage, result):
+    """记录某步骤完成及其结果"""
+    state = load_state()
+    if state.get('note_id') != note_id:
+        state = {"note_id": note_id, "completed": {}}
+    state['completed'][stage] = result
+    save_state(state)
@@ -0,0 +1,18 @@
+import sys
+import types
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / "scripts"))
+
+# agent_workflow 在导入时需要 claude_agent_sdk；未安装时注册一个空模块，
+# 测试中用到的名字都会在 agent_workflow 上单独替换
+try:
+    import claude_agent_sdk  # noqa: F401
+except ImportError:
+    sdk = types.ModuleType("claude_agent_sdk")
+    for name in ["query", "tool", "create_sdk_mcp_server", "ClaudeAgentOptions",
+                 "AssistantMessage", "ResultMessage", "StreamEvent", "TextBlock"]:
+        setattr(sdk, name, type(name, (), {}))
+    sys.modules["claude_agent_sdk"] = sdk
@@ -0,0 +1,177 @@
+import asyncio
+import json
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+import pytest
+
+import agent_workflow
+import select_next_note
+import workflow_state
+
+
+@dataclass
+class FakeTextBlock:
+    text: str
+
+
+@dataclass
+class FakeAssistantMessage:
+    content: list
+
+
+@dataclass
+class FakeStreamEvent:
+    event: dict
+
+
+@dataclass
+class FakeResultMessage:
+    num_turns: int = 1
+    duration_ms: int = 1000
+    total_cost_usd: float = 0.01
+    usage: dict = field(default_factory=dict)
+    is_error: bool = False
+
+
+def fake_tool(name, description, input_schema):
+    def decorator(handler):
+        handler.tool_name = name
+        return handler
+    return decorator
+
+
+def fake_server(name, version, tools):
+    return {tool.tool_name: tool for tool in tools}
+
+
+def turn_events(input_tokens, output_tokens):
+    """模拟一次模型调用的流事件"""
+    return [
+        FakeStreamEvent({"type": "message_start", "message": {"usage": {"input_tokens": input_tokens, "output_tokens": 1}}}),
+        FakeStreamEvent({"type": "message_delta", "usage": {"output_tokens": output_tokens}}),
+        FakeStreamEvent({"type": "message_stop"}),
+    ]
+
+
+async def call_tool(tools, name, args):
+    result = await tools[name](args)
+    assert not result.get("is_error"), result
+    return json.loads(result["content"][0]["text"])
+
+
+@pytest.fixture
+def agent(monkeypatch, tmp_path):
+    """替换 SDK 和流水线步骤，记录每个步骤的实际执行"""
+    monkeypatch.setattr(workflow_state, "STATE_FILE", str(tmp_path / "workflow_state.json"))
+    monkeypatch.setattr(select_next_note, "select_next_note", lambda: "007")
+    for name, value in {
+        "tool": fake_tool,
+        "create_sdk_mcp_server": fake_server,
+        "ClaudeAgentOptions": lambda **kwargs: SimpleNamespace(**kwargs),
+        "AssistantMessage": FakeAssistantMessage,
+        "ResultMessage": FakeResultMessage,
+        "StreamEvent": FakeStreamEvent,
+        "TextBlock": FakeTextBlock,
+    }.items():
+        monkeypatch.setattr(agent_workflow, name, value)
+
+    calls = []
+
+    def make_stage(stage):
+        def run(note_id):
+            calls.append((stage, note_id))
+            return {"stage": stage}
+        return run
+
+    monkeypatch.setattr(agent_workflow, "PIPELINE_STAGES", [
+        (stage, make_stage(stage)) for stage in ["prompts", "images", "upload", "log"]
+    ])
+    return calls
+
+
+def test_agent_completes_all_stages_without_fallback(agent, monkeypatch, capsys):
+    async def query(prompt, options):
+        tools = options.mcp_servers["xhs"]
+        note_id = (await call_tool(tools, "select_next_note", {}))["note_id"]
+        for event in turn_events(100, 20):
+            yield event
+        for stage in ["prompts", "images", "upload", "log"]:
+            await call_tool(tools, stage, {"note_id": note_id})
+        for event in turn_events(300, 40):
+            yield event
+        yield FakeAssistantMessage([FakeTextBlock("全部完成")])
+        yield FakeResultMessage(num_turns=2, usage={"input_tokens": 400, "output_tokens": 60})
+
+    async def no_fallback(note_id=None):
+        raise AssertionError("不应回退到直接模式")
+
+    monkeypatch.setattr(agent_workflow, "query", query)
+    monkeypatch.setattr(agent_workflow, "run_workflow", no_fallback)
+
+    assert asyncio.run(agent_workflow.run_with_claude())
+    assert agent == [(stage, "007") for stage in ["prompts", "images", "upload", "log"]]
+
+    out = capsys.readouterr().out
+    assert "第 1 轮" in out and "输入 100 / 输出 20 tokens" in out
+    assert "第 2 轮" in out and "输入 300 / 输出 40 tokens" in out
+    assert "第 3 轮" not in out
+
+
+def test_agent_failure_resumes_from_checkpoint(agent, monkeypatch, capsys):
+    async def query(prompt, options):
+        tools = options.mcp_servers["xhs"]
+        note_id = (await call_tool(tools, "select_next_note", {}))["note_id"]
+        await call_tool(tools, "prompts", {"note_id": note_id})
+        await call_tool(tools, "images", {"note_id": note_id})
+        for event in turn_events(100, 20):
+            yield event
+        raise RuntimeError("连接中断")
+
+    monkeypatch.setattr(agent_workflow, "query", query)
+
+    assert asyncio.run(agent_workflow.run_with_claude())
+    assert agent == [(stage, "007") for stage in ["prompts", "images", "upload", "log"]]
+
+    out = capsys.readouterr().out
+    assert "回退到直接执行模式" in out
+    assert out.count("已完成，跳过") == 2
+
+
+def test_run_stage_rejects_out_of_order_or_other_note(agent):
+    agent_workflow.stage_select("007")
+
+    with pytest.raises(RuntimeError):
+        agent_workflow.run_stage("images", "007")
+    with pytest.raises(RuntimeError):
+        agent_workflow.run_stage("prompts", "008")
+    assert agent == []
+
+    result, resumed = agent_workflow.run_stage("prompts", "007")
+    assert (result, resumed) == ({"stage": "prompts"}, False)
+    assert agent_workflow.run_stage("prompts", "007") == ({"stage": "prompts"}, True)
+
+
+def test_unknown_explicit_note_does_not_block_automatic_run(agent):
+    assert not asyncio.run(agent_workflow.run_workflow("999"))
+    assert agent == []
+
+    assert asyncio.run(agent_workflow.run_workflow())
+    assert agent == [(stage, "007") for stage in ["prompts", "images", "upload", "log"]]
+
+
+def test_failed_explicit_note_is_not_resumed_automatically(agent, monkeypatch):
+    def failing_upload(note_id):
+        agent.append(("upload", note_id))
+        raise RuntimeError("飞书不可用")
+
+    stages = dict(agent_workflow.PIPELINE_STAGES)
+    monkeypatch.setattr(agent_workflow, "PIPELINE_STAGES", [
+        (stage, failing_upload if stage == "upload" else stages[stage]) for stage in stages
+    ])
+    assert not asyncio.run(agent_workflow.run_workflow("003"))
+    monkeypatch.setattr(agent_workflow, "PIPELINE_STAGES", list(stages.items()))
+
+    agent.clear()
+    assert asyncio.run(agent_workflow.run_workflow())
+    assert agent == [(stage, "007") for stage in ["prompts", "images", "upload", "log"]]
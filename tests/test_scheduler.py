@@ -0,0 +1,62 @@
+import asyncio
+import json
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+import scheduler
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_step_day_field_still_requires_weekday():
+    # 2026-10-19 是周一，19 是奇数日；*/2 视为不限，日和周都要满足
+    schedule = scheduler.CronSchedule("0 0 */2 * 1")
+    assert schedule.matches(utc(2026, 10, 19))
+    assert not schedule.matches(utc(2026, 10, 21))  # 周三，奇数日
+    assert not schedule.matches(utc(2026, 10, 20))  # 周二
+
+
+def test_cron_does_not_repeat_slot_after_early_wake():
+    sched = scheduler.Scheduler(scheduler.CronSchedule("0 12 * * *"))
+    first = sched._next_cron_time(utc(2026, 10, 19, 8))
+    assert first == utc(2026, 10, 19, 12)
+
+    sched.next_run = first
+    # 提前 1 秒醒来（或时钟回拨）时，下一次仍是次日
+    assert sched._next_cron_time(first - timedelta(seconds=1)) == utc(2026, 10, 20, 12)
+
+
+def test_run_endpoint_enqueues_once_server_is_up(monkeypatch):
+    jobs, servers = [], []
+    start_server = scheduler.start_status_server
+
+    async def fake_workflow(note_id=None):
+        jobs.append(note_id)
+        return True
+
+    def capture_server(sched, host, port):
+        servers.append(start_server(sched, host, port))
+        return servers[-1]
+
+    monkeypatch.setattr(scheduler, "run_workflow", fake_workflow)
+    monkeypatch.setattr(scheduler, "start_status_server", capture_server)
+    sched = scheduler.Scheduler(None)
+
+    async def main():
+        task = asyncio.create_task(sched.run("127.0.0.1", 0))
+        while not servers:
+            await asyncio.sleep(0.01)
+        # 状态接口一启动，POST /run 就能入队
+        port = servers[0].server_address[1]
+        request = urllib.request.Request(f"http://127.0.0.1:{port}/run?note_id=007", method="POST")
+        response = await asyncio.to_thread(urllib.request.urlopen, request)
+        assert response.status == 202
+        assert json.load(response)["note_id"] == "007"
+        while not jobs:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(main())
+    assert jobs == ["007"]
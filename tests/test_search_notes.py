@@ -0,0 +1,68 @@
+import pytest
+
+import note_corpus
+import search_notes
+
+NOTE_TEMPLATE = """## 【笔记{note_id}】
+
+### SEO优化
+- **核心关键词**：{keywords}
+- **长尾关键词**：{keywords}
+
+### 标题选项（3选1）
+- **标题A**：{title}
+
+### 正文内容
+
+{content}
+
+### 配图说明
+- P1：封面图
+"""
+
+
+def write_notes(path, notes):
+    path.write_text("\n".join(NOTE_TEMPLATE.format(**note) for note in notes), encoding="utf-8")
+
+
+@pytest.fixture
+def notes_dir(monkeypatch, tmp_path):
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    monkeypatch.setattr(note_corpus, "NOTES_DIR", str(notes))
+    monkeypatch.setattr(search_notes, "INDEX_FILE", str(tmp_path / "search_index.json"))
+    monkeypatch.setattr(search_notes, "_index", None)
+    return notes
+
+
+def test_single_character_query_matches_inside_words(notes_dir):
+    write_notes(notes_dir / "a.md", [
+        {"note_id": "001", "keywords": "盐城选岗", "title": "选岗黄金法则", "content": "岗位分析"},
+        {"note_id": "002", "keywords": "备考计划", "title": "备考时间线", "content": "从零开始"},
+    ])
+
+    assert [note_id for note_id, _ in search_notes.search_notes("岗")] == ["001"]
+    assert [note_id for note_id, _ in search_notes.search_notes("备考")] == ["002"]
+
+
+def test_duplicate_note_id_survives_removal_of_first_file(notes_dir):
+    first = {"note_id": "001", "keywords": "选岗", "title": "旧版本", "content": "选岗"}
+    second = {"note_id": "001", "keywords": "选岗", "title": "新版本", "content": "选岗"}
+    write_notes(notes_dir / "a.md", [first])
+    write_notes(notes_dir / "b.md", [second])
+
+    index = search_notes.load_index()
+    assert index.titles["001"] == "旧版本"
+
+    (notes_dir / "a.md").unlink()
+    index = search_notes.load_index()
+    assert index.titles["001"] == "新版本"
+    assert [note_id for note_id, _ in index.search("选岗")] == ["001"]
+
+    # 新增排序更靠前的文件时，归属与 note_corpus 一致地转移过去
+    write_notes(notes_dir / "0.md", [dict(first, title="最新版本")])
+    index = search_notes.load_index()
+    assert index.titles["001"] == note_corpus.get_note("001")["title"] == "最新版本"
+    assert index.files["0.md"]["notes"] == ["001"]
+    assert index.files["b.md"]["notes"] == []
+    assert [note_id for note_id, _ in index.search("选岗")] == ["001"]
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+import note_corpus
+import similarity
+
+NOTE_TEMPLATE = """## 【笔记{note_id}】
+
+### 标题选项（3选1）
+- **标题A**：笔记{note_id}
+
+### 正文内容
+
+正文{note_id}
+
+### 配图说明
+- P1：{cover}
+- P9：总结+咨询引导
+"""
+
+
+@pytest.fixture
+def workspace(monkeypatch, tmp_path):
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    (notes / "a.md").write_text(
+        NOTE_TEMPLATE.format(note_id="001", cover="封面数据图")
+        + NOTE_TEMPLATE.format(note_id="002", cover="封面对比图"),
+        encoding="utf-8",
+    )
+    output = tmp_path / "output"
+    output.mkdir()
+    monkeypatch.setattr(note_corpus, "NOTES_DIR", str(notes))
+    monkeypatch.setattr(similarity, "ROOT_DIR", str(tmp_path))
+    monkeypatch.setattr(similarity, "OUTPUT_DIR", str(output))
+    monkeypatch.setattr(similarity, "REPORT_FILE", str(output / "similarity_report.json"))
+    return tmp_path
+
+
+def test_refresh_rewrites_corrupt_report(workspace):
+    report_file = workspace / "output" / "similarity_report.json"
+    report_file.write_text("{not json", encoding="utf-8")
+    image = workspace / "output" / "note001_images" / "p9.png"
+    image.parent.mkdir()
+    image.write_bytes(b"png")
+
+    assert similarity.refresh_image_reuse() == {"002/P9": str(image)}
+    report = json.loads(report_file.read_text(encoding="utf-8"))
+    assert report["image_reuse"] == {"002/P9": {"source": "output/note001_images/p9.png", "distance": 0}}
+
+
+def test_refresh_picks_up_images_generated_after_report(workspace):
+    assert similarity.refresh_image_reuse() == {}
+
+    image = workspace / "output" / "note001_images" / "p9.png"
+    image.parent.mkdir()
+    image.write_bytes(b"png")
+
+    reuse = similarity.refresh_image_reuse()
+    assert reuse == {"002/P9": str(image)}
+    report = json.loads((workspace / "output" / "similarity_report.json").read_text(encoding="utf-8"))
+    assert report["image_reuse"] == {"002/P9": {"source": "output/note001_images/p9.png", "distance": 0}}
+
+
+BODY = (
+    "上海买房先看通勤和学区，再看楼龄和物业。首付比例、贷款年限和月供占收入的比例要提前算清楚，"
+    "二手房还要核实产权、户口迁出和维修基金。看房时留意采光、噪音和楼下商铺，多跑几次不同时间段。"
+)
+UNRELATED = (
+    "周末带孩子去郊野公园露营，帐篷、防潮垫和驱蚊水一定要备齐。傍晚风大记得加外套，"
+    "营地不允许明火，烧烤要选带炉具的区域，垃圾自己带走，离开前检查营位有没有遗留物品。"
+)
+
+
+def test_minhash_finds_near_duplicate_bodies_only():
+    corpus = {
+        "001": {"content": BODY},
+        "002": {"content": BODY.replace("多跑几次", "多去几次")},
+        "003": {"content": UNRELATED},
+    }
+    signatures = {note_id: similarity.minhash(note["content"]) for note_id, note in corpus.items()}
+    assert similarity.minhash(BODY) == signatures["001"]
+
+    candidates = similarity.minhash_candidates(signatures)
+    assert ("001", "002") in candidates
+    assert not {("001", "003"), ("002", "003")} & candidates
+
+    pairs = similarity.find_similar_notes(corpus)
+    assert [(p["a"], p["b"]) for p in pairs] == [("001", "002")]
+    assert pairs[0]["similarity"] >= 0.8
+
+
+def test_hamming_candidates_keep_pairs_within_max_distance():
+    # max_distance=3 分成 4 段，每段 16 位；在前 3 段各翻转 1 位，只剩最后一段相同
+    within = (1 << 15) | (1 << 16) | (1 << 47)
+    beyond = within | (1 << 63)
+    hashes = {"a": 0, "b": within, "c": beyond}
+    assert similarity.hamming(0, within) == 3
+
+    candidates = similarity.hamming_candidates(hashes, max_distance=3)
+    assert ("a", "b") in candidates
+    # 每段都有差异、距离超过阈值的一对不会进入候选
+    assert ("a", "c") not in candidates